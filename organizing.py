@@ -1,10 +1,35 @@
+import os
+
+# Must be set before torch is first imported (transformers pulls it in):
+# expandable segments curb CUDA allocator fragmentation over long sessions
+os.environ.setdefault("PYTORCH_CUDA_ALLOC_CONF", "expandable_segments:True,max_split_size_mb:128")
+
 import streamlit as st
-from transformers import pipeline, CLIPProcessor, CLIPModel
+from threading import Thread
+from transformers import pipeline, AutoTokenizer, CLIPProcessor, CLIPModel, TextIteratorStreamer
 from PIL import Image
 import pandas as pd
+import random
 import torch
 import traceback
 
+try:
+    import onnxruntime as ort
+except ImportError:  # Optional: CPU inference falls back to eager PyTorch
+    ort = None
+
+try:
+    import pyarrow
+except ImportError:  # Optional: CSV parsing falls back to pandas' default engine
+    pyarrow = None
+
+if torch.cuda.is_available():
+    # Leave headroom for other processes on shared GPUs, allow TF32 matmuls,
+    # and let cuDNN autotune kernels for the fixed-shape CLIP inputs
+    torch.cuda.set_per_process_memory_fraction(0.8)
+    torch.backends.cuda.matmul.allow_tf32 = True
+    torch.backends.cudnn.benchmark = True
+
 # ========================
 # Page Configuration
 # ========================
@@ -15,41 +40,186 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# ========================
+# Constants
+# ========================
+# Fixed concept vocabulary scored by CLIP against uploaded images
+CONCEPTS = (
+    "healthcare", "education", "sustainability", "robotics",
+    "smart agriculture", "business innovation", "AI assistants",
+    "wearable technology", "gaming", "urban development"
+)
+
+# Constant instruction suffix appended to every generation prompt; tokenized
+# once in load_models so per-call tokenization only covers the user's text
+PROMPT_SUFFIX = (
+    "Provide a detailed, creative, and practical solution to the problem.\n"
+    "Describe its real-world applications and potential benefits."
+)
+
+# Canned (idea, use_case) pairs served by the "Random Concept" path; an
+# immutable tuple built once at import so each click is a plain index
+RANDOM_CONCEPTS = (
+    (
+        "AI-powered IoT sensors to optimize energy usage in smart homes.",
+        "Reduces energy bills by up to 40% while ensuring sustainability."
+    ),
+    (
+        "AR glasses for real-time translation during conversations.",
+        "Breaks language barriers, enabling seamless global communication."
+    ),
+    (
+        "Wearable devices that monitor mental health and provide guided therapy sessions.",
+        "Helps individuals manage stress and anxiety proactively."
+    ),
+    (
+        "Personalized e-learning platforms using adaptive AI to match individual learning styles.",
+        "Improves student outcomes and engagement by 50%."
+    ),
+    (
+        "Blockchain-based food traceability system.",
+        "Ensures food safety by tracking the origin and quality of produce."
+    )
+)
+
 # ========================
 # Load AI Models
 # ========================
+@st.cache_resource
 def load_models():
     """
     Load text generation and image processing models with debug logs.
-    Includes automatic fallback to CPU if GPU is unavailable.
+    Cached with st.cache_resource so the models are loaded once per process
+    and shared across reruns and sessions instead of reloading on every
+    widget interaction. Includes automatic fallback to CPU if GPU is unavailable.
     """
     try:
         print("Starting to load models...")
-        
+
         # Load text generation model (Fallback to CPU if no GPU available)
         print("Loading text generation model (gpt2 for reliability)...")
+        gpt2_tokenizer = AutoTokenizer.from_pretrained("gpt2")
+        # GPT-2 has no pad token; padding with EOS silences the per-call
+        # warning and lets generate() batch/pad cleanly
+        gpt2_tokenizer.pad_token_id = gpt2_tokenizer.eos_token_id
         text_gen = pipeline(
             "text-generation",
             model="gpt2",  # Using GPT-2 for lightweight operation
-            device=0 if torch.cuda.is_available() else -1
+            tokenizer=gpt2_tokenizer,
+            device=0 if torch.cuda.is_available() else -1,
+            # FP16 weights on GPU halve memory traffic and enable Tensor Cores
+            torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32
         )
         print("Text generation model loaded successfully.")
-        
+
+        # Pre-tokenize the constant instruction suffix once; generation calls
+        # only tokenize the short user-specific part of the prompt
+        prompt_suffix_ids = gpt2_tokenizer(PROMPT_SUFFIX, return_tensors="pt").input_ids
+
         # Load CLIP model and processor
         print("Loading CLIP model and processor...")
-        clip_model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
+        clip_model = CLIPModel.from_pretrained(
+            "openai/clip-vit-base-patch32",
+            # Fused scaled_dot_product_attention (FlashAttention on supported
+            # GPUs): same FLOPs as eager attention, far less memory traffic
+            attn_implementation="sdpa",
+            # FP16 weights on GPU: half the HBM traffic, Tensor Core GEMMs
+            torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32
+        )
         clip_processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
+        clip_model.eval()  # Inference only; done once here so reruns skip it
+        clip_ort_session = None
+        if torch.cuda.is_available():
+            clip_model = clip_model.to("cuda")
+        else:
+            if ort is not None:
+                # Export the FP32 vision tower to ONNX (before quantization)
+                # and serve it through ONNX Runtime, whose fused,
+                # multithreaded graph is typically 2-4x faster than eager
+                # PyTorch on CPU vision transformers. Any failure here just
+                # means we stay on the eager path, so it must not reach
+                # load_models' catch-all (which would st.stop() the app).
+                try:
+                    # Export fresh each process rather than trusting an
+                    # on-disk file possibly left by an older model revision
+                    onnx_path = "clip_vision.onnx"
+                    print("Exporting CLIP vision tower to ONNX...")
+                    dummy_pixels = torch.zeros(1, 3, 224, 224)
+                    torch.onnx.export(
+                        clip_model.vision_model,
+                        dummy_pixels,
+                        onnx_path,
+                        input_names=["pixel_values"],
+                        output_names=["last_hidden_state", "pooler_output"],
+                        dynamic_axes={"pixel_values": {0: "batch"}},
+                        opset_version=17
+                    )
+                    sess_options = ort.SessionOptions()
+                    sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+                    sess_options.intra_op_num_threads = os.cpu_count()
+                    clip_ort_session = ort.InferenceSession(
+                        onnx_path, sess_options, providers=["CPUExecutionProvider"]
+                    )
+                    print("CLIP vision tower running through ONNX Runtime.")
+                except Exception:
+                    clip_ort_session = None
+                    print(f"ONNX export/session failed; falling back to eager CLIP: {traceback.format_exc()}")
+            # CPU-only path: dynamically quantize CLIP's Linear layers to INT8
+            # so the matmul-bound forwards use FBGEMM int8 kernels instead of
+            # FP32. GPT-2 is left alone: its GEMMs live in transformers'
+            # Conv1D modules, which quantize_dynamic has no swap for — adding
+            # it to the set would only convert the weight-tied lm_head
+            # (silently untying it from the embedding) for no speedup.
+            print("CUDA not available; applying INT8 dynamic quantization to CLIP...")
+            clip_model = torch.quantization.quantize_dynamic(
+                clip_model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+            print("INT8 dynamic quantization applied to CLIP.")
         print("CLIP model and processor loaded successfully.")
-        
+
+        if torch.cuda.is_available():
+            # Fuse the many small Linear/LayerNorm/GELU ops via Inductor and
+            # cut per-op launch overhead. Compile the vision tower itself:
+            # the app never calls clip_model's forward, only
+            # get_image_features, which runs vision_model underneath.
+            # Default mode rather than "reduce-overhead": CUDA graphs would
+            # re-capture for every distinct upload batch size. CPU is
+            # skipped: Inductor gains are smaller there and compilation
+            # takes long.
+            print("Compiling CLIP vision tower with torch.compile...")
+            clip_model.vision_model = torch.compile(clip_model.vision_model, fullgraph=False)
+            # Warm-up forward so the first user click doesn't pay compile
+            # cost. Must run under the same inference_mode + autocast stack
+            # as analyze_image: Dynamo guards on autocast state, so a graph
+            # compiled outside it would be recompiled on the first real call.
+            dummy_pixels = torch.zeros(1, 3, 224, 224, device="cuda", dtype=torch.float16)
+            with torch.inference_mode(), torch.autocast("cuda", dtype=torch.float16):
+                clip_model.get_image_features(pixel_values=dummy_pixels)
+            print("CLIP vision tower compiled and warmed up.")
+
+        # The concept list is a constant, so its text-tower forward is pure
+        # repeated work at runtime. Encode it once here; analyze_image then
+        # only runs the image tower plus a single image x text matmul.
+        print("Precomputing CLIP text features for the concept list...")
+        # Tokenize the fixed concept strings directly; no need to route
+        # through the combined processor's text/image dispatch
+        text_inputs = clip_processor.tokenizer(list(CONCEPTS), return_tensors="pt", padding=True)
+        if torch.cuda.is_available():
+            text_inputs = text_inputs.to("cuda")
+        with torch.inference_mode():
+            clip_text_features = clip_model.get_text_features(**text_inputs)
+            clip_text_features = clip_text_features / clip_text_features.norm(dim=-1, keepdim=True)
+        print("CLIP text features precomputed.")
+
         print("All models loaded successfully.")
-        return text_gen, clip_model, clip_processor
+        return text_gen, prompt_suffix_ids, clip_model, clip_processor, clip_text_features, clip_ort_session
     except Exception as e:
         print(f"Error loading models: {traceback.format_exc()}")
         st.error(f"Error loading models: {e}")
         st.stop()
 
-# Load models with debugging
-text_generator, clip_model, clip_processor = load_models()
+# Load models once (cached); subsequent reruns reuse the same instances
+text_generator, prompt_suffix_ids, clip_model, clip_processor, clip_text_features, clip_ort_session = load_models()
 
 # ========================
 # Core Functionalities
@@ -58,45 +228,99 @@ text_generator, clip_model, clip_processor = load_models()
 def generate_innovation(prompt, context="general"):
     """
     Generate an innovative solution based on the provided problem statement.
-    Uses the text generation pipeline to output detailed, relevant, and creative ideas.
+    Returns an iterator of text chunks (for st.write_stream) so tokens render
+    as they are produced instead of after the full generation finishes.
     """
     try:
-        structured_prompt = (
-            f"Context: {context.capitalize()}.\n"
-            f"Problem: {prompt}.\n"
-            "Provide a detailed, creative, and practical solution to the problem.\n"
-            "Describe its real-world applications and potential benefits."
+        # Only the user-specific part is tokenized here; the constant
+        # instruction suffix was tokenized once at load time
+        user_part = f"Context: {context.capitalize()}.\nProblem: {prompt}.\n"
+        user_ids = text_generator.tokenizer(user_part, return_tensors="pt").input_ids
+        input_ids = torch.cat([user_ids, prompt_suffix_ids], dim=1).to(text_generator.model.device)
+        # timeout bounds the consumer's wait so a wedged generation can never
+        # block st.write_stream forever
+        streamer = TextIteratorStreamer(
+            text_generator.tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=120.0
         )
-        outputs = text_generator(
-            structured_prompt,
-            max_length=200,  # Adjusted for detailed responses
-            num_return_sequences=1,
-            temperature=0.7,  # Creativity encouraged with slight randomness
-            top_p=0.95  # Focus on likely options while allowing some novelty
-        )
-        return outputs[0]["generated_text"].strip()
+        generation_errors = []
+
+        def _generate():
+            try:
+                # Autocast keeps GPU activations in FP16; disabled (no-op) on CPU
+                with torch.autocast("cuda", dtype=torch.float16, enabled=torch.cuda.is_available()):
+                    text_generator.model.generate(
+                        input_ids,
+                        max_new_tokens=150,  # Budget for the answer only, independent of prompt length
+                        do_sample=True,
+                        temperature=0.7,  # Creativity encouraged with slight randomness
+                        top_p=0.95,  # Focus on likely options while allowing some novelty
+                        use_cache=True,  # Reuse the KV cache during decoding
+                        pad_token_id=text_generator.tokenizer.eos_token_id,
+                        streamer=streamer
+                    )
+            except Exception:
+                # st.error cannot run on a worker thread; hand the traceback
+                # to the consumer generator below
+                generation_errors.append(traceback.format_exc())
+            finally:
+                # Always push the stop signal so the consumer unblocks even
+                # when generate() raised before finishing
+                streamer.end()
+
+        def _stream():
+            yield from streamer
+            if generation_errors:
+                st.error(f"Error generating innovation idea: {generation_errors[0]}")
+
+        # Generation runs in the background; the streamer yields tokens to
+        # the UI as soon as they are decoded
+        Thread(target=_generate, daemon=True).start()
+        return _stream()
     except Exception as e:
         st.error(f"Error generating innovation idea: {traceback.format_exc()}")
         return None
 
-def analyze_image(image):
+def analyze_image(images):
     """
-    Analyze the provided image using CLIP to suggest the most likely concepts.
-    This helps generate industry-specific solutions based on visual cues.
+    Analyze the provided images using CLIP to suggest the most likely concepts.
+    Accepts a list of PIL images and runs them as one batched forward pass,
+    returning a list with the top concepts per image. This helps generate
+    industry-specific solutions based on visual cues.
     """
     try:
-        concepts = [
-            "healthcare", "education", "sustainability", "robotics",
-            "smart agriculture", "business innovation", "AI assistants",
-            "wearable technology", "gaming", "urban development"
+        # Call the image processor directly: the combined processor would
+        # re-run tokenizer dispatch/padding machinery we no longer need
+        pixel_values = clip_processor.image_processor(images, return_tensors="pt")["pixel_values"]
+        if torch.cuda.is_available():
+            # Stage the pixels in pinned memory so the host-to-device copy is
+            # asynchronous and overlaps with any in-flight GPU work
+            pixel_values = pixel_values.pin_memory().to("cuda", non_blocking=True)
+        # Autocast keeps GPU activations in FP16; disabled (no-op) on CPU.
+        # Only the image tower runs here; the concept text features were
+        # precomputed once in load_models.
+        # inference_mode is strictly cheaper than no_grad: it also skips
+        # autograd view/version-counter tracking
+        with torch.inference_mode(), torch.autocast("cuda", dtype=torch.float16, enabled=torch.cuda.is_available()):
+            if clip_ort_session is not None:
+                # CPU: run the vision tower through the fused ONNX Runtime
+                # graph, then project with the (cheap) torch Linear
+                pooled = clip_ort_session.run(
+                    ["pooler_output"], {"pixel_values": pixel_values.numpy()}
+                )[0]
+                image_features = clip_model.visual_projection(torch.from_numpy(pooled))
+            else:
+                image_features = clip_model.get_image_features(pixel_values=pixel_values)
+            image_features = image_features / image_features.norm(dim=-1, keepdim=True)
+            logits_per_image = (image_features @ clip_text_features.T) * clip_model.logit_scale.exp()
+            # Top-k on device: only the 3 winning probabilities cross to Python,
+            # avoiding a full-vector GPU->CPU sync plus a Python-level sort
+            probs, idx = logits_per_image.softmax(dim=-1).topk(3, dim=-1)
+        probs = probs.cpu().tolist()
+        idx = idx.cpu().tolist()
+        return [
+            [(CONCEPTS[i], p) for p, i in zip(row_probs, row_idx)]
+            for row_probs, row_idx in zip(probs, idx)
         ]
-        inputs = clip_processor(text=concepts, images=image, return_tensors="pt", padding=True)
-        with torch.no_grad():
-            outputs = clip_model(**inputs)
-            logits_per_image = outputs.logits_per_image
-            probs = logits_per_image.softmax(dim=1).squeeze().tolist()
-            concept_scores = sorted(zip(concepts, probs), key=lambda x: x[1], reverse=True)
-        return concept_scores[:3]  # Return top 3 most relevant concepts
     except Exception as e:
         st.error(f"Error analyzing image: {traceback.format_exc()}")
         return None
@@ -107,8 +331,20 @@ def analyze_data(df):
     """
     try:
         summary = f"The dataset contains **{df.shape[0]} rows** and **{df.shape[1]} columns**."
-        insights = f"Key columns: {', '.join(df.columns)}"
-        stats = df.describe().to_dict()
+        # Avoid joining (and rendering) hundreds of column names on wide CSVs
+        if len(df.columns) > 50:
+            insights = f"Key columns: {', '.join(df.columns[:50])}, … ({len(df.columns) - 50} more)"
+        else:
+            insights = f"Key columns: {', '.join(df.columns)}"
+        # Subsetting to numeric columns first skips Pandas formatting the
+        # non-numeric part of the frame
+        num_df = df.select_dtypes(include="number")
+        if len(num_df.columns):
+            stats = num_df.describe().to_dict(orient="dict")
+        else:
+            # All-text CSV: describe() would raise on an empty frame, so fall
+            # back to object-column stats (count/unique/top/freq)
+            stats = df.describe(include="all").to_dict(orient="dict")
         use_case = (
             "Based on these insights, predictive analytics models, trend analysis, or dashboards "
             "can be created to drive business or operational improvements."
@@ -122,29 +358,8 @@ def generate_random_concept():
     """
     Generate a completely random innovation concept with a use case.
     """
-    concepts = [
-        {
-            "idea": "AI-powered IoT sensors to optimize energy usage in smart homes.",
-            "use_case": "Reduces energy bills by up to 40% while ensuring sustainability."
-        },
-        {
-            "idea": "AR glasses for real-time translation during conversations.",
-            "use_case": "Breaks language barriers, enabling seamless global communication."
-        },
-        {
-            "idea": "Wearable devices that monitor mental health and provide guided therapy sessions.",
-            "use_case": "Helps individuals manage stress and anxiety proactively."
-        },
-        {
-            "idea": "Personalized e-learning platforms using adaptive AI to match individual learning styles.",
-            "use_case": "Improves student outcomes and engagement by 50%."
-        },
-        {
-            "idea": "Blockchain-based food traceability system.",
-            "use_case": "Ensures food safety by tracking the origin and quality of produce."
-        }
-    ]
-    return random.choice(concepts)
+    idea, use_case = random.choice(RANDOM_CONCEPTS)
+    return {"idea": idea, "use_case": use_case}
 
 # ========================
 # Streamlit User Interface
@@ -173,33 +388,58 @@ if input_type == "Text":
                 output = generate_innovation(user_input, context)
                 if output:
                     st.success("🎯 Innovative Solution:")
-                    st.write(output)
+                    st.write_stream(output)
         else:
             st.warning("Please enter a valid problem statement or idea.")
 
 elif input_type == "Image":
-    uploaded_image = st.file_uploader("Upload an image (JPG/PNG):", type=["jpg", "png", "jpeg"])
-    if uploaded_image:
-        image = Image.open(uploaded_image)
-        st.image(image, caption="Uploaded Image", use_column_width=True)
-        if st.button("Analyze Image & Generate Idea"):
-            with st.spinner("Analyzing image..."):
-                concepts = analyze_image(image)
-                if concepts:
-                    st.success("🔍 Top Relevant Concepts:")
-                    for label, score in concepts:
-                        st.write(f"- **{label.capitalize()}** — Probability: {score:.4f}")
-                    top_concept = concepts[0][0]
+    uploaded_images = st.file_uploader(
+        "Upload one or more images (JPG/PNG):",
+        type=["jpg", "png", "jpeg"],
+        accept_multiple_files=True
+    )
+    if uploaded_images:
+        images = []
+        for uploaded_image in uploaded_images:
+            image = Image.open(uploaded_image)
+            # For JPEGs, draft() lets libjpeg decode at reduced DCT resolution
+            # (near-free downscale at decode time); no-op for PNG. Must run
+            # before the first pixel access triggers the full decode.
+            image.draft("RGB", (512, 512))
+            # Downscale once up front: CLIP resizes to 224 anyway and the
+            # browser only shows ~400px, so shipping a full-resolution photo
+            # over the websocket is pure waste
+            image.thumbnail((512, 512))
+            images.append(image)
+        for uploaded_image, image in zip(uploaded_images, images):
+            st.image(image, caption=uploaded_image.name, width=400)
+        if st.button("Analyze Images & Generate Idea"):
+            with st.spinner("Analyzing images..."):
+                # One batched CLIP forward over all uploads amortizes kernel
+                # launch and weight-read overhead across the whole stack
+                results = analyze_image(images)
+                if results:
+                    for uploaded_image, concepts in zip(uploaded_images, results):
+                        st.success(f"🔍 Top Relevant Concepts — {uploaded_image.name}:")
+                        for label, score in concepts:
+                            st.write(f"- **{label.capitalize()}** — Probability: {score:.4f}")
+                    top_concept = results[0][0][0]
                     output = generate_innovation(f"{top_concept} innovation", context)
                     if output:
                         st.markdown("✨ **Generated Idea:**")
-                        st.write(output)
+                        st.write_stream(output)
 
 elif input_type == "CSV Data":
     uploaded_csv = st.file_uploader("Upload a CSV file:", type=["csv"])
     if uploaded_csv:
-        df = pd.read_csv(uploaded_csv)
-        st.dataframe(df)
+        # Arrow engine: multithreaded parsing into columnar memory, far
+        # faster than the default tokenizer on multi-MB uploads
+        if pyarrow is not None:
+            df = pd.read_csv(uploaded_csv, engine="pyarrow", dtype_backend="pyarrow")
+        else:
+            df = pd.read_csv(uploaded_csv)
+        # Rendering the full frame dominates wall time on large uploads
+        st.dataframe(df.head(200))
         if st.button("Generate Insights & Innovation"):
             with st.spinner("Analyzing data..."):
                 summary, insights, stats, use_case = analyze_data(df)
@@ -2,6 +2,7 @@ import streamlit as st
 from transformers import pipeline, CLIPProcessor, CLIPModel
 from PIL import Image
 import pandas as pd
+import random
 import torch
 import traceback
 